@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic_ai import Agent
+from pydantic_ai.agent import AgentRunResult
+
+
+async def run_batch_async(
+    agent: Agent,
+    prompts: Sequence[str],
+    deps_list: Optional[Sequence[Any]] = None,
+    concurrency: int = 32,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    **run_kwargs: Any,
+) -> List[AgentRunResult]:
+    """Run an agent over many prompts concurrently, returning results in prompt order.
+
+    At most `concurrency` runs are in flight at once. `deps_list`, when given, is
+    paired with `prompts` by position. `on_progress(completed, total)` is called
+    after each run finishes. Remaining keyword arguments (e.g. `model`) are passed
+    to every `agent.run` call. Every run reuses the same `agent` instance; pass a
+    shared, module-level agent rather than building one per batch.
+    """
+    if agent is None:
+        raise ValueError("run_batch_async needs an agent instance to share across runs")
+    if deps_list is None:
+        deps_list = [None] * len(prompts)
+    if len(deps_list) != len(prompts):
+        raise ValueError(f"Got {len(prompts)} prompts but {len(deps_list)} deps")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(prompts)
+    completed = 0
+
+    async def run_one(prompt: str, deps: Any) -> AgentRunResult:
+        nonlocal completed
+        async with semaphore:
+            result = await agent.run(prompt, deps=deps, **run_kwargs)
+        completed += 1
+        if on_progress is not None:
+            on_progress(completed, total)
+        return result
+
+    tasks = [run_one(prompt, deps) for prompt, deps in zip(prompts, deps_list)]
+    return await asyncio.gather(*tasks)
+
+
+async def run_worker_pool(
+    jobs: Sequence[Tuple[Any, str, Dict[str, Any]]],
+    num_workers: int = 4,
+) -> List[Any]:
+    """Run `(agent, prompt, run_kwargs)` jobs from an asyncio.Queue with a fixed number of workers.
+
+    Unlike gathering every job at once, at most `num_workers` runs are in flight, so
+    a long job list can't flood the HTTP connection pool. Each worker awaits
+    `agent.run(prompt, **run_kwargs)` and the return values are collected in job
+    order. If any job fails, the first exception is raised once the queue is drained.
+    """
+    queue: "asyncio.Queue[Tuple[int, Any, str, Dict[str, Any]]]" = asyncio.Queue()
+    for i, (agent, prompt, run_kwargs) in enumerate(jobs):
+        queue.put_nowait((i, agent, prompt, run_kwargs))
+
+    results: List[Any] = [None] * len(jobs)
+
+    async def worker() -> None:
+        while True:
+            i, agent, prompt, run_kwargs = await queue.get()
+            try:
+                results[i] = await agent.run(prompt, **run_kwargs)
+            except Exception as exc:
+                results[i] = exc
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(num_workers)]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
@@ -0,0 +1,22 @@
+from typing import Callable
+
+from pydantic_ai.models import Model
+from pydantic_ai.models.wrapper import WrapperModel
+
+
+class LazyModel(WrapperModel):
+    """Model that calls `factory` to build the real model the first time it is used.
+
+    Agents can hold a LazyModel from import time, so creating them stays cheap,
+    while callers still run them without passing a model. `factory` should cache
+    its result (e.g. with functools.cache) so every agent shares one model.
+    """
+
+    def __init__(self, factory: Callable[[], Model]):
+        # Skip WrapperModel.__init__, which would resolve the wrapped model eagerly
+        Model.__init__(self)
+        self._factory = factory
+
+    @property
+    def wrapped(self) -> Model:
+        return self._factory()
@@ -0,0 +1,171 @@
+import hashlib
+import inspect
+import time
+from typing import Any, Dict, Generic, List, Optional, Protocol, Tuple, TypeVar
+
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_jsonable_python
+from pydantic_ai import Agent
+
+OutputT = TypeVar("OutputT")
+
+
+class CacheBackend(Protocol):
+    """Key/value store used by CachedAgent."""
+
+    def get(self, key: str) -> Optional[Any]: ...
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+
+class MemoryCache:
+    """In-process cache backend; entries are lost when the process exits."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], Any]] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+
+
+class DiskCache:
+    """Cache backend persisted with `diskcache`, so entries survive between runs.
+
+    The cache directory is opened on first use rather than on construction.
+    """
+
+    def __init__(self, directory: str = ".llm_cache"):
+        self.directory = directory
+        self._cache = None
+
+    def _open(self):
+        if self._cache is None:
+            import diskcache
+
+            self._cache = diskcache.Cache(self.directory)
+        return self._cache
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._open().get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._open().set(key, value, expire=ttl)
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Hash a JSON-serializable request payload into a stable cache key."""
+    serialized = orjson.dumps(payload, default=to_jsonable_python, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(serialized).hexdigest()
+
+
+def _internal_attr(obj: Any, name: str) -> Any:
+    # The key reads pydantic-ai internals; fail loudly if one is renamed rather than
+    # silently leaving it out of the key and serving stale answers
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        raise RuntimeError(
+            f"{type(obj).__name__} has no attribute {name!r}; "
+            "CachedAgent needs updating for this pydantic-ai version"
+        ) from None
+
+
+def _function_source(function: Any) -> str:
+    try:
+        return inspect.getsource(function)
+    except (OSError, TypeError):
+        return getattr(function, "__qualname__", repr(function))
+
+
+def _tool_definitions(agent: Agent) -> List[Dict[str, Any]]:
+    # Hash each tool's source alongside its definition, so changing what a tool does
+    # invalidates its entries as well as changing its signature or docstring
+    tools = _internal_attr(_internal_attr(agent, "_function_toolset"), "tools")
+    definitions = []
+    for name in sorted(tools):
+        tool = tools[name]
+        definitions.append(
+            {
+                "name": name,
+                "description": tool.description,
+                "parameters": _internal_attr(tool, "tool_def").parameters_json_schema,
+                "source": _function_source(_internal_attr(tool, "function")),
+            }
+        )
+    return definitions
+
+
+def _dynamic_system_prompts(agent: Agent) -> List[str]:
+    # Hash the source of system prompt functions, so editing one invalidates its entries
+    runners = _internal_attr(agent, "_system_prompt_functions")
+    return [_function_source(_internal_attr(runner, "function")) for runner in runners]
+
+
+class CachedAgent(Generic[OutputT]):
+    """Deterministic exact-match cache in front of an agent.
+
+    Runs at temperature 0 are keyed on the model, system prompts (including the
+    source of dynamic system prompt functions), user prompt, message history, deps,
+    tool definitions and source, and output schema, and served from `cache` when
+    the same request was made before. A cached entry that no longer validates
+    against the output type is treated as a miss and overwritten. Runs at any other
+    temperature always go to the model. Raises RuntimeError if the pydantic-ai
+    internals the key is built from are missing.
+    """
+
+    def __init__(self, agent: Agent, cache: CacheBackend, ttl: float = 3600):
+        self.agent = agent
+        self.cache = cache
+        self.ttl = ttl
+        self._output_adapter = TypeAdapter(agent.output_type)
+        self._output_schema = self._output_adapter.json_schema()
+
+    def cache_key(self, user_prompt: str, **kwargs: Any) -> str:
+        model = kwargs.get("model") or self.agent.model
+        settings = kwargs.get("model_settings") or self.agent.model_settings or {}
+        payload = {
+            "model": getattr(model, "model_name", model),
+            "system_prompt": list(_internal_attr(self.agent, "_system_prompts")),
+            "dynamic_system_prompts": _dynamic_system_prompts(self.agent),
+            "messages": {
+                "user_prompt": user_prompt,
+                "message_history": kwargs.get("message_history") or [],
+                "deps": kwargs.get("deps"),
+            },
+            "tools": _tool_definitions(self.agent),
+            "output_schema": self._output_schema,
+            "temperature": settings.get("temperature"),
+        }
+        return cache_key(payload)
+
+    async def run(self, user_prompt: str, **kwargs: Any) -> OutputT:
+        """Return the agent's output for `user_prompt`, serving it from the cache when possible."""
+        settings = kwargs.get("model_settings") or self.agent.model_settings or {}
+        if settings.get("temperature") != 0:
+            result = await self.agent.run(user_prompt, **kwargs)
+            return result.output
+
+        key = self.cache_key(user_prompt, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            try:
+                return self._output_adapter.validate_python(cached)
+            except ValidationError:
+                # Stored for an older output type; fall through and overwrite it
+                pass
+
+        result = await self.agent.run(user_prompt, **kwargs)
+        self.cache.set(key, self._output_adapter.dump_python(result.output, mode="json"), ttl=self.ttl)
+        return result.output
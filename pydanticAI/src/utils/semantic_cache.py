@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, NamedTuple, Optional, Tuple, Type, TypeVar
+
+import numpy as np
+from pydantic import BaseModel
+from pydantic_ai import Agent
+
+OutputT = TypeVar("OutputT", bound=BaseModel)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivially different prompts share a key."""
+    return " ".join(prompt.lower().split())
+
+
+class SentenceTransformerEmbedder:
+    """Embed prompts with a small local sentence-transformers model.
+
+    The model is loaded on first use so importing this module stays cheap. Calls run
+    in worker threads, so the load is locked to happen only once.
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def __call__(self, text: str) -> np.ndarray:
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return np.asarray(self._model.encode(text), dtype=np.float32)
+
+
+class _CacheEntry(NamedTuple):
+    expires_at: float
+    embedding: np.ndarray
+    output: Dict[str, Any]
+
+
+class CachingAgent(Generic[OutputT]):
+    """Semantic response cache in front of a structured-output agent.
+
+    Prompts are first looked up by the sha256 of their normalized text. On a miss,
+    the prompt is embedded and compared against every cached prompt; the closest
+    one is reused when its cosine similarity exceeds `similarity_threshold`.
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached.
+
+    Prompts for which `bypass` returns True always go to the model and are never
+    stored, so a prompt that needs a fresh answer can't be matched to a similar
+    cached one. Outputs for which `should_cache` returns False are never stored.
+    The cache key is the prompt alone, so `run` takes no deps or message history.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        output_type: Type[OutputT],
+        embed: Optional[Callable[[str], np.ndarray]] = None,
+        similarity_threshold: float = 0.92,
+        ttl: float = 3600,
+        max_entries: int = 1024,
+        should_cache: Optional[Callable[[OutputT], bool]] = None,
+        bypass: Optional[Callable[[str], bool]] = None,
+    ):
+        self.agent = agent
+        self.output_type = output_type
+        self.embed = embed or SentenceTransformerEmbedder()
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.should_cache = should_cache
+        self.bypass = bypass
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # (keys, embeddings, norms), rebuilt lazily after the entries change
+        self._matrix: Optional[Tuple[list, np.ndarray, np.ndarray]] = None
+
+    async def run(self, user_prompt: str) -> OutputT:
+        """Return the agent's output for `user_prompt`, serving it from the cache when possible."""
+        if self.bypass is not None and self.bypass(user_prompt):
+            result = await self.agent.run(user_prompt)
+            return result.output
+
+        self._evict_expired()
+        key = hashlib.sha256(normalize_prompt(user_prompt).encode()).hexdigest()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return self.output_type.model_validate(entry.output)
+
+        # Embedding is CPU-bound, and the first call loads the embedding model
+        embedding = await asyncio.to_thread(self.embed, user_prompt)
+        similar_key = self._most_similar(embedding)
+        if similar_key is not None:
+            self._entries.move_to_end(similar_key)
+            return self.output_type.model_validate(self._entries[similar_key].output)
+
+        result = await self.agent.run(user_prompt)
+        output = result.output
+        if self.should_cache is None or self.should_cache(output):
+            self._store(key, embedding, output)
+        return output
+
+    def _most_similar(self, query: np.ndarray) -> Optional[str]:
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            keys = list(self._entries)
+            embeddings = np.stack([self._entries[k].embedding for k in keys])
+            self._matrix = (keys, embeddings, np.linalg.norm(embeddings, axis=1))
+        keys, embeddings, norms = self._matrix
+        similarities = (embeddings @ query) / (norms * np.linalg.norm(query))
+        best = int(np.argmax(similarities))
+        if similarities[best] > self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def _store(self, key: str, embedding: np.ndarray, output: OutputT) -> None:
+        self._entries[key] = _CacheEntry(time.monotonic() + self.ttl, embedding, output.model_dump())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, entry in self._entries.items() if entry.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix = None
@@ -0,0 +1,7 @@
+import orjson
+from pydantic import BaseModel
+
+
+def dump_json(model: BaseModel) -> bytes:
+    """Serialize a Pydantic model to indented JSON with orjson's C encoder."""
+    return orjson.dumps(model.model_dump(mode="json"), option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)